@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+# Energy functions by name. Each one takes an array of pixels whose last
+# three axes are row, column and color, wraps around at the borders, and
+# returns the energy of every pixel. Its radius is how far away a pixel
+# can be and still change the energy of another, or None if every pixel
+# of the picture can.
+ENERGY_FUNCTIONS = {}
+
+LUMA = np.array([0.299, 0.587, 0.114])
+
+def energy_function(name: str, radius: int | None):
+    '''
+    Register a whole-image energy function under the given name
+    '''
+    def register(fn):
+        fn.radius = radius
+        ENERGY_FUNCTIONS[name] = fn
+        return fn
+    return register
+
+def _gradient(pixels: np.ndarray, weights: tuple[int, int, int]) -> np.ndarray:
+    '''
+    Return the squared gradient of every pixel, summed over the colors,
+    after smoothing across the gradient direction with the given weights
+    '''
+    pixels = pixels.astype(np.float64)
+    side, center, _ = weights
+
+    def smooth(a, axis):
+        return side * (np.roll(a, 1, axis=axis) + np.roll(a, -1, axis=axis)) + center * a
+
+    dx = np.roll(pixels, 1, axis=-2) - np.roll(pixels, -1, axis=-2)
+    dy = np.roll(pixels, 1, axis=-3) - np.roll(pixels, -1, axis=-3)
+    if side:
+        dx = smooth(dx, -3)
+        dy = smooth(dy, -2)
+    return (dx**2).sum(axis=-1) + (dy**2).sum(axis=-1)
+
+@energy_function('dual_gradient', radius=1)
+def dual_gradient(pixels: np.ndarray) -> np.ndarray:
+    '''
+    Return the dual-gradient energy of every pixel
+    '''
+    return _gradient(pixels, (0, 1, 0))
+
+@energy_function('sobel', radius=1)
+def sobel(pixels: np.ndarray) -> np.ndarray:
+    '''
+    Return the squared Sobel gradient of every pixel
+    '''
+    return _gradient(pixels, (1, 2, 1))
+
+@energy_function('scharr', radius=1)
+def scharr(pixels: np.ndarray) -> np.ndarray:
+    '''
+    Return the squared Scharr gradient of every pixel
+    '''
+    return _gradient(pixels, (3, 10, 3))
+
+@energy_function('entropy', radius=4)
+def entropy(pixels: np.ndarray, bins=16) -> np.ndarray:
+    '''
+    Return the Shannon entropy of the brightness in the 9x9 window around
+    every pixel
+    '''
+    levels = np.minimum((pixels @ LUMA) * bins // 256, bins - 1).astype(np.uint8)
+    # -p*log2(p) for each of the 82 counts a bin can have in a window
+    p = np.arange(82) / 81
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = -np.where(p > 0, p * np.log2(p), 0)
+    result = np.zeros(levels.shape)
+    # One bin at a time, counting with box sums in bytes, which can't
+    # overflow since a window has 81 pixels
+    for level in range(bins):
+        counts = (levels == level).view(np.uint8)
+        for axis in (-2, -1):
+            counts = sum(np.roll(counts, shift, axis=axis) for shift in range(-4, 5))
+        result += terms[counts]
+    return result
+
+@energy_function('saliency', radius=None)
+def saliency(pixels: np.ndarray) -> np.ndarray:
+    '''
+    Return the dual-gradient energy of every pixel, weighted by the spectral
+    residual saliency of the picture so that salient regions cost more
+    '''
+    spectrum = np.fft.fft2(pixels @ LUMA)
+    amplitude = np.log(np.abs(spectrum) + 1e-9)
+    average = sum(np.roll(np.roll(amplitude, dy, axis=-2), dx, axis=-1)
+                  for dy in (-1, 0, 1) for dx in (-1, 0, 1)) / 9
+    residual = np.exp(amplitude - average + 1j * np.angle(spectrum))
+    salient = np.abs(np.fft.ifft2(residual))**2
+    salient /= salient.max(axis=(-2, -1), keepdims=True) + 1e-12
+    return dual_gradient(pixels) * (1 + salient)
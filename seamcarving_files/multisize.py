@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+from picture import Picture, retarget
+import numpy as np
+import struct
+
+# A multisize file starts with this header: the magic bytes, the format
+# version, and the width and height of the picture. The vertical and then
+# horizontal removal indices follow as little-endian uint16 planes, and
+# then the RGB pixels, all indexed by row then column.
+MAGIC = b'SCMS'
+VERSION = 1
+_HEADER = struct.Struct('<4sIII')
+
+def save_multisize(path: str, carver, minimum=1, batch=1):
+    '''
+    Build the vertical and horizontal removal indices of a SeamCarver and
+    write them, along with its picture, to a multisize file. See
+    SeamCarver.build_retarget_index for the options.
+    '''
+    width, height = carver.width(), carver.height()
+    if max(width, height) > np.iinfo(np.uint16).max + 1:
+        raise ValueError(f"Can't store the indices of a {width}x{height} picture")
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, width, height))
+        for vertical in (True, False):
+            f.write(carver.build_retarget_index(vertical, minimum, batch).astype('<u2').tobytes())
+        f.write(carver.pixels().tobytes())
+
+class MultisizeFile:
+    '''
+    A multisize file, memory-mapped. Resizing it is a gather over the
+    mapped planes; no seams are searched for.
+    '''
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is not a multisize file")
+        magic, version, self._width, self._height = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a multisize file")
+        elif version != VERSION:
+            raise ValueError(f"Unsupported multisize file version {version}")
+        size = self._width * self._height
+        self._indices = np.memmap(path, dtype='<u2', mode='r', offset=_HEADER.size,
+                                  shape=(2, self._height, self._width))
+        self._pixels = np.memmap(path, dtype=np.uint8, mode='r', offset=_HEADER.size + 4 * size,
+                                 shape=(self._height, self._width, 3))
+
+    def width(self) -> int:
+        '''
+        Return the width of the stored picture
+        '''
+        return self._width
+
+    def height(self) -> int:
+        '''
+        Return the height of the stored picture
+        '''
+        return self._height
+
+    def retarget(self, size: int, vertical=True) -> Picture:
+        '''
+        Return the stored picture shrunk to size columns (rows if not
+        vertical)
+        '''
+        index = self._indices[0 if vertical else 1]
+        return Picture.from_array(retarget(self._pixels, index, size, vertical))
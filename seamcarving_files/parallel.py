@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import weakref
+
+# The shared buffers as seen from a worker process, attached by _attach
+_shared = None
+
+def _buffers(shm: shared_memory.SharedMemory, capacity: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Return the energy, cumulative cost and parent offset arrays laid out in
+    a block of shared memory
+    '''
+    energy = np.ndarray((capacity,), dtype=np.float64, buffer=shm.buf)
+    cost = np.ndarray((capacity,), dtype=np.float64, buffer=shm.buf, offset=8 * capacity)
+    parents = np.ndarray((capacity,), dtype=np.int8, buffer=shm.buf, offset=16 * capacity)
+    return energy, cost, parents
+
+def _attach(name: str, capacity: int):
+    '''
+    (Worker process) Attach to the shared buffers
+    '''
+    global _shared
+    shm = shared_memory.SharedMemory(name=name)
+    _shared = (shm, *_buffers(shm, capacity))
+
+def _advance(task: tuple[int, int, int, int, int, int]):
+    '''
+    (Worker process) Compute rows top to bottom-1 of the cumulative cost for
+    columns lo to hi-1, starting from row top-1. A pixel's cost depends on
+    one more column on each side for every row above it, so a margin as
+    wide as the strip is computed too and then thrown away.
+    '''
+    height, width, top, bottom, lo, hi = task
+    _, energy, cost, parents = _shared
+    size = height * width
+    energy = energy[:size].reshape(height, width)
+    cost = cost[:size].reshape(height, width)
+    parents = parents[:size].reshape(height, width)
+
+    margin = bottom - top
+    left, right = max(lo - margin, 0), min(hi + margin, width)
+    columns = np.arange(right - left)
+    neighbors = np.full((3, right - left), np.inf)
+    prev = cost[top-1, left:right]
+    for j in range(top, bottom):
+        neighbors[0, 1:] = prev[:-1]
+        neighbors[1] = prev
+        neighbors[2, :-1] = prev[1:]
+        best = neighbors.argmin(axis=0)
+        prev = energy[j, left:right] + neighbors[best, columns]
+        cost[j, lo:hi] = prev[lo-left:hi-left]
+        parents[j, lo:hi] = best[lo-left:hi-left] - 1
+
+def _release(pool, shm: shared_memory.SharedMemory):
+    '''
+    Stop a pool of workers and free a block of shared memory
+    '''
+    pool.terminate()
+    pool.join()
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        # Arrays still point into it; the mapping goes away with them
+        pass
+
+class TiledSeamFinder:
+    '''
+    Runs the cumulative-cost DP of a seam search on a pool of processes.
+    The columns are split into one tile per process, and the rows into
+    strips; the workers only wait for each other once per strip. The
+    energy and cost arrays live in shared memory, so only the tile bounds
+    are sent to the workers. The workers and shared memory are freed by
+    close(), or when the finder is garbage collected.
+    '''
+    def __init__(self, processes: int, capacity: int, strip=32):
+        self.processes = processes
+        self.capacity = capacity
+        self._strip = strip
+        self._shm = shared_memory.SharedMemory(create=True, size=17 * capacity)
+        self._energy, self._cost, self._parents = _buffers(self._shm, capacity)
+        self._pool = Pool(processes, initializer=_attach, initargs=(self._shm.name, capacity))
+        self._finalizer = weakref.finalize(self, _release, self._pool, self._shm)
+
+    def cumulative_energy(self, energy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Return the cost of the cheapest seam from the top row to every pixel
+        of a 2-D energy array, and the offset of each seam's parent column
+        '''
+        height, width = energy.shape
+        size = height * width
+        self._energy[:size].reshape(height, width)[:] = energy
+        cost = self._cost[:size].reshape(height, width)
+        parents = self._parents[:size].reshape(height, width)
+        cost[0] = energy[0]
+        parents[0] = 0
+
+        bounds = np.linspace(0, width, self.processes + 1).astype(int).tolist()
+        tiles = [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi]
+        for top in range(1, height, self._strip):
+            bottom = min(top + self._strip, height)
+            self._pool.map(_advance, [(height, width, top, bottom, lo, hi) for lo, hi in tiles])
+        return cost, parents
+
+    def close(self):
+        '''
+        Stop the workers and free the shared memory
+        '''
+        self._energy = self._cost = self._parents = None
+        self._finalizer()
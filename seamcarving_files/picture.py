@@ -1,26 +1,163 @@
 #!/usr/bin/env python3
 
+from collections.abc import Mapping
 from PIL import Image
 from PyQt6.QtGui import QImage, QPixmap
+import numpy as np
 
-class Picture(dict):
-    def __init__(self, img: Image.Image):
+def _rgb_array(pixels: np.ndarray) -> np.ndarray:
+    '''
+    Return an array of pixels as a contiguous height x width x 3 array of
+    bytes, without copying it if it already is one. Grayscale pixels are
+    spread over the three colors, and an alpha channel is dropped.
+    '''
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None].repeat(3, axis=2)
+    if pixels.ndim != 3 or pixels.shape[2] not in (3, 4):
+        raise ValueError(f"Expected height x width x 3 pixels, got shape {pixels.shape}")
+    if pixels.shape[2] == 4:
+        pixels = pixels[:, :, :3]
+    if pixels.dtype != np.uint8 or not pixels.flags.c_contiguous or not pixels.flags.writeable:
+        pixels = np.array(pixels, dtype=np.uint8, order='C')
+    return pixels
+
+def retarget(pixels: np.ndarray, index: np.ndarray, size: int, vertical=True) -> np.ndarray:
+    '''
+    Return the pixels of a picture shrunk to size columns (rows if not
+    vertical), keeping the pixels that a removal index built on it by
+    SeamCarver.build_retarget_index says were removed last
+    '''
+    if not vertical:
+        return retarget(pixels.swapaxes(0, 1), index.T, size).swapaxes(0, 1)
+    height, width = index.shape
+    if pixels.shape[:2] != index.shape:
+        raise ValueError("The index doesn't match the picture")
+    elif not 0 < size <= width:
+        raise ValueError(f"Can't retarget {width} pixels to {size}")
+    return pixels[index >= width - size].reshape(height, size, *pixels.shape[2:])
+
+class Picture(Mapping):
+    # The PIL image last returned by picture(), until the pixels change
+    _image = None
+
+    def __init__(self, img: Image.Image | np.ndarray):
+        '''
+        Takes a PIL image, and stores its pixels in a contiguous
+        height x width x 3 buffer of bytes. Also takes such a buffer, or
+        any array that can be turned into one, see from_array.
+        '''
+        if isinstance(img, Image.Image):
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            pixels = np.array(img)
+        else:
+            pixels = _rgb_array(img)
+        self._height, self._width = pixels.shape[:2]
+        self._pixels = pixels
+
+    @classmethod
+    def from_pil(cls, img: Image.Image, *args, **kwargs) -> 'Picture':
+        '''
+        Return a picture of a PIL image in any mode, converted to RGB once
+        and copied into the buffer in one go
+        '''
+        return cls(img, *args, **kwargs)
+
+    @classmethod
+    def from_array(cls, pixels: np.ndarray, *args, **kwargs) -> 'Picture':
+        '''
+        Return a picture of a height x width x 3 array of bytes, which is
+        used as the buffer without copying it, so the picture and the array
+        change together. Grayscale and RGBA arrays, arrays of other types
+        and read-only arrays are converted into a new buffer.
+        '''
+        return cls(np.asarray(pixels), *args, **kwargs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview, size: tuple[int, int], mode='RGB',
+                   *args, **kwargs) -> 'Picture':
+        '''
+        Return a picture of raw pixel data of the given width and height,
+        in the 'RGB', 'RGBA' or 'L' mode. Writable data such as a bytearray
+        is used as the buffer without copying it.
+        '''
+        channels = {'RGB': 3, 'RGBA': 4, 'L': 1}
+        if mode not in channels:
+            raise ValueError(f"Unsupported mode {mode!r}")
+        width, height = size
+        pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * channels[mode])
+        pixels = pixels.reshape(height, width, channels[mode])
+        if mode == 'L':
+            pixels = pixels[:, :, 0]
+        return cls.from_array(pixels, *args, **kwargs)
+
+    def __getitem__(self, key: tuple[int, int]) -> tuple[int, int, int]:
+        '''
+        Return the color of the pixel at column i and row j
         '''
-        Takes a PIL image, and stores pixels in its dictionary
+        i, j = key
+        if not (0 <= i < self._width and 0 <= j < self._height):
+            raise KeyError(key)
+        return tuple(self._pixels[j, i].tolist())
+
+    def __setitem__(self, key: tuple[int, int], color: tuple[int, int, int]):
+        '''
+        Set the color of the pixel at column i and row j
         '''
-        self._width, self._height = img.size
-        pixels = iter(img.getdata())
+        i, j = key
+        if not (0 <= i < self._width and 0 <= j < self._height):
+            raise KeyError(key)
+        self._pixels[j, i] = color
+        self._image = None
+
+    def __iter__(self):
         for j in range(self._height):
             for i in range(self._width):
-                self[i, j] = next(pixels)
+                yield i, j
+
+    def __len__(self) -> int:
+        return self._width * self._height
+
+    def pixels(self) -> np.ndarray:
+        '''
+        Return a read-only view of the current picture's pixels, indexed
+        by row then column. The buffer keeps its original size as the
+        picture shrinks, so only the top-left width x height corner is
+        live. Set pixels with picture[i, j] = color, so caches follow.
+        '''
+        view = self._pixels[:self._height, :self._width]
+        view.flags.writeable = False
+        return view
+
+    def copy(self) -> 'Picture':
+        '''
+        Return a copy of the current picture
+        '''
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other._pixels = self.pixels().copy()
+        return other
 
     def picture(self) -> Image.Image:
         '''
-        Get the current picture represented by self
+        Get the current picture represented by self. The image is copied
+        out of the buffer in one go and kept until the picture changes,
+        so don't modify it; changes made to the buffer through an array
+        passed to from_array aren't noticed.
+        '''
+        if self._image is None:
+            # Each row of the buffer is as long as the original picture's
+            self._image = Image.frombuffer('RGB', (self._width, self._height), self._pixels,
+                                           'raw', 'RGB', self._pixels.strides[0], 1)
+        return self._image
+
+    def retarget(self, index: np.ndarray, size: int, vertical=True) -> 'Picture':
+        '''
+        Return a new picture of the current one shrunk to size columns
+        (rows if not vertical), using an index from
+        SeamCarver.build_retarget_index
         '''
-        picture = Image.new('RGB', (self._width, self._height))
-        picture.putdata([self[i, j] for j in range(self._height) for i in range(self._width)])
-        return picture
+        return type(self).from_array(retarget(self.pixels(), index, size, vertical))
 
     def width(self) -> int:
         '''
@@ -50,13 +187,22 @@ class Picture(dict):
             else:
                 self[i, j] = color
 
+    def _to_qimage(self) -> QImage:
+        '''
+        (Internal use only) Return a QImage that reads the current picture
+        straight from the pixel buffer, without copying it. It shows any
+        later change to the buffer, but not to the picture's size.
+        '''
+        qim = QImage(self._pixels.data, self._width, self._height, self._pixels.strides[0],
+                     QImage.Format.Format_RGB888)
+        # The QImage doesn't own the memory it wraps, so keep the buffer
+        # alive for as long as it is
+        qim._buffer = self._pixels
+        return qim
+
     def _to_pixmap(self) -> QPixmap:
         '''
         (Internal use only) Convert the current picture into a QPixmap object
         for the GUI display
         '''
-        img = self.picture()
-        data = img.tobytes('raw', 'RGB')
-        stride = len(data)//self._height
-        qim = QImage(data, self._width, self._height, stride, QImage.Format.Format_RGB888)
-        return QPixmap.fromImage(qim)
+        return QPixmap.fromImage(self._to_qimage())
@@ -1,82 +1,633 @@
 #!/usr/bin/env python3
 
 from picture import Picture
+from energy import ENERGY_FUNCTIONS, LUMA, dual_gradient
+from parallel import TiledSeamFinder
 from PIL import Image
-import sys
+import numpy as np
+
+def _energy_at(pixels: np.ndarray, rows: np.ndarray, cols: np.ndarray, energy_fn=dual_gradient) -> np.ndarray:
+    '''
+    Return the energy of the pixels at the given rows and columns, computed
+    on the window around each of them that the energy function can see
+    '''
+    radius = energy_fn.radius
+    height, width = pixels.shape[:2]
+    offsets = np.arange(-radius, radius + 1)
+    r = (rows[:, None] + offsets) % height
+    c = (cols[:, None] + offsets) % width
+    windows = pixels[r[:, :, None], c[:, None, :]]
+    return energy_fn(windows)[:, radius, radius]
+
+def _affected_pixels(seam: list[int], width: int, height: int, radius=1):
+    '''
+    Return the rows and columns of the pixels whose energy may change after
+    removing a vertical seam from a picture, given the new width
+    '''
+    seam = np.asarray(seam)
+    offsets = np.arange(-radius, radius + 1)
+    window = seam[(np.arange(height)[:, None] + offsets) % height]
+    lo = window.min(axis=1) - radius
+    hi = np.minimum(window.max(axis=1) + radius, lo + width)
+    # Pixels close to the left and right borders wrap around the seam too
+    lo = np.concatenate([lo, np.full(height, -radius)])
+    hi = np.concatenate([hi, np.full(height, radius)])
+    counts = hi - lo
+    rows = np.repeat(np.tile(np.arange(height), 2), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    cols = np.repeat(lo, counts) + np.arange(counts.sum()) - starts
+    return rows, cols % width
+
+# Once the cells left out of the cone of changed costs get fewer than this
+# in a row of the kept DP, whole rows are recomputed rather than patched:
+# that takes fewer steps per row, which is what most of the time goes to
+_PATCH_WIDTH = 128
+
+def _pack_rows(array: np.ndarray, seam: np.ndarray, width: int, block=1 << 16):
+    '''
+    Remove the given column of every row of a 2-D array, given its new
+    width, by packing the columns between the leftmost and rightmost of
+    them with a mask, then moving the ones right of that all at once
+    '''
+    height = len(seam)
+    lo, hi = int(seam.min()), int(seam.max())
+    keep = np.ones((height, hi - lo + 1), dtype=bool)
+    keep[np.arange(height), seam - lo] = False
+    array[:height, lo:hi] = array[:height, lo:hi+1][keep].reshape(height, hi - lo)
+    # An overlapping copy goes through a temporary array, so the rows are
+    # moved a few at a time to keep that small
+    step = max(block // (width - hi + 1), 1)
+    for j in range(0, height, step):
+        array[j:min(j + step, height), hi:width] = array[j:min(j + step, height), hi+1:width+1]
+
+def forward_costs(intensity: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Return the cost of the edges created by removing each pixel of a 2-D
+    intensity array, when the seam reaches it from the upper left, from
+    straight above and from the upper right
+    '''
+    padded = np.pad(intensity, ((1, 0), (1, 1)), mode='edge')
+    left, right, above = padded[1:, :-2], padded[1:, 2:], padded[:-1, 1:-1]
+    up = np.abs(right - left)
+    return up + np.abs(above - left), up, up + np.abs(above - right)
+
+# Energy added to protected pixels and taken away from pixels to remove,
+# enough to outweigh any seam through unmarked pixels
+MASK_ENERGY = 1e10
+
 class SeamCarver(Picture):
-    def energy(self, i: int, j: int) -> float:
+    _energy = None
+    _mask = None
+    _energy_name = 'dual_gradient'
+    _scratch_buffers = None
+    _tiler = None
+    # The backward-energy DP of the last seam search, kept as (vertical,
+    # cumulative costs, parent offsets) to be patched as seams are removed.
+    # Those live in the scratch buffers, so any other DP throws them away.
+    _costs = None
+
+    def __init__(self, img: Image.Image | np.ndarray, energy='dual_gradient'):
         '''
-        Return the energy of pixel at column i and row j
+        Takes a PIL image, and the name of the energy function to carve
+        it with
         '''
+        Picture.__init__(self, img)
+        self.set_energy_function(energy)
 
-        if 0 <= i < self.width() and 0 <= j < self.height():
-            Rx = abs(self[(i-1) % self.width(),j][0] - self[(i+1) % self.width(),j][0])
-            Gx = abs(self[(i-1) % self.width(),j][1] - self[(i+1) % self.width(),j][1])
-            Bx = abs(self[(i-1) % self.width(),j][2] - self[(i+1) % self.width(),j][2])
-            dX = ((Rx**2) + (Gx**2) + (Bx**2))
+    def __enter__(self) -> 'SeamCarver':
+        return self
 
-            Ry = abs(self[i,(j-1) % self.height()][0] - self[i,(j+1) % self.height()][0])
-            Gy = abs(self[i,(j-1) % self.height()][1] - self[i,(j+1) % self.height()][1])
-            By = abs(self[i,(j-1) % self.height()][2] - self[i,(j+1) % self.height()][2])
-            dY = ((Ry**2) + (Gy**2) + (By**2))
+    def __exit__(self, *exc_info):
+        self.close()
 
-            return (dX+dY)
+    def set_energy_function(self, name: str):
+        '''
+        Use the energy function registered under the given name in
+        energy.ENERGY_FUNCTIONS from now on
+        '''
+        if name not in ENERGY_FUNCTIONS:
+            raise ValueError(f"Unknown energy function {name!r}")
+        if name != self._energy_name:
+            self._energy = None
+            self._costs = None
+        self._energy_name = name
+
+    def set_mask(self, protect=None, remove=None):
+        '''
+        Mark pixels to keep out of seams, and pixels to carve away first.
+        Both are boolean arrays indexed by row then column, the size of the
+        current picture. The marks are carved along with the picture;
+        calling set_mask() with neither clears them.
+        '''
+        if protect is None and remove is None:
+            self._mask = None
+        else:
+            self._mask = np.zeros(self._pixels.shape[:2])
+            mask = self._mask[:self._height, :self._width]
+            for marks, offset in ((protect, MASK_ENERGY), (remove, -MASK_ENERGY)):
+                if marks is not None:
+                    marks = np.asarray(marks, dtype=bool)
+                    if marks.shape != mask.shape:
+                        raise ValueError("Mask doesn't match the size of the picture")
+                    mask[marks] += offset
+        self._energy = None
+        self._costs = None
+
+    def remove_object(self, vertical=True) -> Picture:
+        '''
+        Remove seams until no pixel marked for removal by set_mask is left,
+        and return the resulting picture
+        '''
+        while self._mask is not None and (self._mask[:self._height, :self._width] < 0).any():
+            self._carve_step(vertical)
+        return self
+
+    def energy(self, i: int, j: int) -> float:
+        '''
+        Return the energy of pixel at column i and row j
+        '''
+        if 0 <= i < self.width() and 0 <= j < self.height():
+            energy_fn = ENERGY_FUNCTIONS[self._energy_name]
+            if energy_fn.radius is None:
+                return float(self.energy_map()[j, i])
+            energy = _energy_at(self.pixels(), np.array([j]), np.array([i]), energy_fn)[0]
+            if self._mask is not None:
+                energy += self._mask[j, i]
+            return float(energy)
         else: #If selected pixel is out of bounds
             raise IndexError("Selected pixel is out of bounds")
-            
 
-    def find_vertical_seam(self) -> list[int]:
+    def energy_map(self, energy=None) -> np.ndarray:
+        '''
+        Return the energy of every pixel in the current picture as a
+        2-D array indexed by row then column. The map for the current
+        energy function is kept between calls and patched up as seams are
+        removed; passing the name of another one computes a fresh map.
+        '''
+        if energy is not None and energy != self._energy_name:
+            if energy not in ENERGY_FUNCTIONS:
+                raise ValueError(f"Unknown energy function {energy!r}")
+            return self._compute_energy(ENERGY_FUNCTIONS[energy])
+        if self._energy is None:
+            self._energy = np.empty(self._pixels.shape[:2])
+            self._refresh_energy()
+        return self._energy[:self._height, :self._width]
+
+    def _compute_energy(self, energy_fn) -> np.ndarray:
+        '''
+        (Internal use only) Return a new energy map of the current picture,
+        including the mask offsets
+        '''
+        energy = energy_fn(self.pixels())
+        if self._mask is not None:
+            energy += self._mask[:self._height, :self._width]
+        return energy
+
+    def _refresh_energy(self):
+        '''
+        (Internal use only) Recompute the whole stored energy map, if any
+        '''
+        self._costs = None
+        if self._energy is not None:
+            self._energy[:self._height, :self._width] = self._compute_energy(ENERGY_FUNCTIONS[self._energy_name])
+
+    def __setitem__(self, key: tuple[int, int], color: tuple[int, int, int]):
+        self._energy = None
+        self._costs = None
+        Picture.__setitem__(self, key, color)
+
+    def find_vertical_seam(self, forward=False, energy=None, processes=1, pyramid=False, band=None) -> list[int]:
         '''
         Return a sequence of indices representing the lowest-energy
-        vertical seam
-        '''        
-        width = Picture.width(self)
-        height = Picture.height(self)
-        
+        vertical seam. forward=True minimizes the energy of the edges its
+        removal would create; energy names an energy function for this
+        seam only; processes > 1 splits the search over worker processes
+        (call close() when done); pyramid=True searches a downsampled map
+        first, faster on wide pictures but not always optimal; band=(lo, hi)
+        only searches columns lo to hi-1. Plain searches keep their DP.
+        '''
+        if self._keeps_costs(forward, energy, processes, pyramid, band):
+            return self._kept_seam(True)
+        lo = self._check_band(band, self._width)
+        seam = self._find_seam(*self._dp_inputs(True, forward, energy, band), processes, pyramid)
+        return [i + lo for i in seam]
 
-        # Create a matrix with the cumulative sum
-        energy_matrix = [[self.energy(i, 0) for i in range(width)]]
-        for j in range(1, height):
-            row = []
-            for i in range(width):
-                # Leftmost column
-                if i == 0:
-                    neighbors = [energy_matrix[j-1][0], energy_matrix[j-1][1]]
-                    row.append(self.energy(0, j) + min(neighbors))
-
-                # Center columns
-                elif i > 0 and i < width-1:
-                    neighbors = [energy_matrix[j-1][i-1], energy_matrix[j-1][i], energy_matrix[j-1][i+1]]
-                    row.append(self.energy(i, j) + min(neighbors))
-
-                # Rightmost column
+    def find_horizontal_seam(self, forward=False, energy=None, processes=1, pyramid=False, band=None) -> list[int]:
+        '''
+        Return a sequence of indices representing the lowest-energy
+        horizontal seam. See find_vertical_seam for the options; band is
+        a range of rows.
+        '''
+        if self._keeps_costs(forward, energy, processes, pyramid, band):
+            return self._kept_seam(False)[::-1]
+        lo = self._check_band(band, self._height)
+        seam = self._find_seam(*self._dp_inputs(False, forward, energy, band), processes, pyramid)
+        return [j + lo for j in seam[::-1]]
+
+    def _keeps_costs(self, forward: bool, energy: str | None, processes: int, pyramid: bool, band) -> bool:
+        '''
+        (Internal use only) Return whether a seam search with these options
+        is a plain backward-energy search, whose DP is kept between seams
+        '''
+        return not forward and energy in (None, self._energy_name) and processes == 1 \
+            and not pyramid and band is None
+
+    def _kept_seam(self, vertical: bool) -> list[int]:
+        '''
+        (Internal use only) Return the lowest-energy top-to-bottom seam of
+        the DP orientation, running the whole DP only if the one kept from
+        the last search is for the other direction or was thrown away
+        '''
+        if self._costs is None or self._costs[0] != vertical:
+            energy, _ = self._dp_inputs(vertical, False, None)
+            self._costs = (vertical, *self._cumulative_energy(energy))
+        _, cost, parents = self._costs
+        height, width = (self._height, self._width) if vertical else (self._width, self._height)
+        return self._trace_seam(parents[:height, :width], int(cost[height-1, :width].argmin()))
+
+    def _patch_costs(self, seam: list[int], vertical: bool, rows: np.ndarray, cols: np.ndarray):
+        '''
+        (Internal use only) Shift the kept DP over a removed seam, and
+        recompute the cells that may have changed: those next to the seam
+        or on a pixel whose energy changed, at the given rows and columns,
+        and those below a cell whose cost changed. The cone below the seam
+        stops widening wherever the costs come out the same as before, and
+        below where it covers nearly a whole row, whole rows are recomputed.
+        '''
+        _, cost, parents = self._costs
+        energy = self.energy_map()
+        seam = np.asarray(seam)
+        if vertical:
+            height, width = self._height, self._width
+        else:
+            # In DP orientation, row r is column width-1-r of the picture
+            energy = energy.T[::-1]
+            height, width = self._width, self._height
+            seam = seam[::-1]
+            rows, cols = height - 1 - cols, rows
+        if width < _PATCH_WIDTH:
+            cost[0, :width] = energy[0]
+            parents[0, :width] = 0
+            self._cost_rows(energy, cost, parents, 1)
+            return
+        _pack_rows(cost, seam, width)
+        _pack_rows(parents, seam, width)
+
+        # Columns lo to hi-1 of every row need recomputing, even if the cost
+        # of the row above doesn't change: they had the seam as a neighbor,
+        # or their energy changed
+        above = np.concatenate([seam[:1], seam[:-1]])
+        lo = np.minimum(above, seam) - 1
+        hi = np.maximum(above, seam) + 1
+        lo[0], hi[0] = width, 0
+        np.minimum.at(lo, rows, cols)
+        np.maximum.at(hi, rows, cols + 1)
+
+        _, _, neighbors, best = self._scratch_buffers
+        new = np.empty(width)
+        columns = self._columns
+        changed_lo, changed_hi = width + 1, -1
+        for j, (row_lo, row_hi) in enumerate(zip(lo.tolist(), hi.tolist())):
+            row_lo = max(min(row_lo, changed_lo - 1), 0)
+            row_hi = min(max(row_hi, changed_hi + 1), width)
+            n = row_hi - row_lo
+            if n <= 0:
+                changed_lo, changed_hi = width + 1, -1
+                continue
+            elif width - n < _PATCH_WIDTH and j > 0:
+                self._cost_rows(energy, cost, parents, j)
+                return
+            if j == 0:
+                new[:n] = energy[0, row_lo:row_hi]
+            else:
+                # The same steps as _cost_rows, on columns row_lo to
+                # row_hi-1 only, so the costs come out exactly the same
+                prev = cost[j-1]
+                neighbors[1, :n] = prev[row_lo:row_hi]
+                if row_lo > 0:
+                    neighbors[0, :n] = prev[row_lo-1:row_hi-1]
+                else:
+                    neighbors[0, 0] = np.inf
+                    neighbors[0, 1:n] = prev[:row_hi-1]
+                if row_hi < width:
+                    neighbors[2, :n] = prev[row_lo+1:row_hi+1]
                 else:
-                    neighbors = [energy_matrix[j-1][i-1], energy_matrix[j-1][i]]
-                    row.append(self.energy(width-1, j) + min(neighbors))
-            energy_matrix.append(row)
-
-        # Last row
-        prev_index = energy_matrix[-1].index(min(energy_matrix[-1]))
-        indexes = [prev_index]
-        for j in range(height-2, -1, -1):
-            j1, j2 = prev_index-1, prev_index+2
-            if prev_index > 0 and prev_index < width-1:
-                neighbors = energy_matrix[j][j1:j2]
-            elif prev_index == 0:
-                neighbors = [sys.maxsize] + energy_matrix[j][:2]
+                    neighbors[2, n-1] = np.inf
+                    neighbors[2, :n-1] = prev[row_lo+1:row_hi]
+                neighbors[:, :n].argmin(axis=0, out=best[:n])
+                np.subtract(best[:n], 1, out=parents[j, row_lo:row_hi], casting='unsafe')
+                np.add(energy[j, row_lo:row_hi], neighbors[best[:n], columns[:n]], out=new[:n])
+            changed = (new[:n] != cost[j, row_lo:row_hi]).nonzero()[0]
+            cost[j, row_lo:row_hi] = new[:n]
+            if changed.size:
+                changed_lo, changed_hi = row_lo + int(changed[0]), row_lo + int(changed[-1]) + 1
             else:
-                neighbors = energy_matrix[j][j1:]
-            prev_index += neighbors.index(min(neighbors))-1
-            indexes.append(prev_index)
-        return indexes[::-1]
+                changed_lo, changed_hi = width + 1, -1
 
-    def find_horizontal_seam(self) -> list[int]:
+    def _check_band(self, band: tuple[int, int] | None, length: int) -> int:
         '''
-        Return a sequence of indices representing the lowest-energy
-        horizontal seam
+        (Internal use only) Raise a ValueError if the band isn't a nonempty
+        range within the given length, and return where it starts
+        '''
+        if band is None:
+            return 0
+        lo, hi = band
+        if not 0 <= lo < hi <= length:
+            raise ValueError(f"Band {band!r} is not within 0 to {length}")
+        return lo
+
+    def find_vertical_seams(self, k: int, forward=False, energy=None) -> list[list[int]]:
+        '''
+        Return up to k vertical seams that don't share any pixel, cheapest
+        first, all traced from a single pass over the picture. There is at
+        most one seam per local minimum of the last row of cumulative costs.
+        '''
+        if k <= 0:
+            return []
+        return self._disjoint_seams(k, *self._dp_inputs(True, forward, energy))
+
+    def find_horizontal_seams(self, k: int, forward=False, energy=None) -> list[list[int]]:
+        '''
+        Return up to k horizontal seams that don't share any pixel. See
+        find_vertical_seams.
+        '''
+        if k <= 0:
+            return []
+        return [seam[::-1] for seam in self._disjoint_seams(k, *self._dp_inputs(False, forward, energy))]
+
+    def _dp_inputs(self, vertical: bool, forward: bool, energy: str | None, band=None) -> tuple:
+        '''
+        (Internal use only) Return the energy array, and the forward costs
+        if any, to run the top-to-bottom seam DP on. band limits them to a
+        range of columns of the DP, which are rows for horizontal seams.
+        '''
+        # The picture read column by column, from the rightmost column to
+        # the leftmost, is the picture rotated by 90 degrees, so horizontal
+        # seams are found on a view and no pixels need to be moved
+        def rotate(a):
+            return a if vertical else a.swapaxes(0, 1)[::-1]
+
+        length = self._width if vertical else self._height
+        lo, hi = band or (0, length)
+        if forward:
+            # The costs at the edges of the band depend on one more pixel
+            # on each side
+            left, right = max(lo - 1, 0), min(hi + 1, length)
+            intensity = rotate(self.pixels())[:, left:right] @ LUMA
+            costs = tuple(c[:, lo - left:hi - left] for c in forward_costs(intensity))
+            if self._mask is not None:
+                energy = rotate(self._mask[:self._height, :self._width])[:, lo:hi]
+            else:
+                energy = np.zeros_like(costs[0])
+            return energy, costs
+
+        energy_fn = ENERGY_FUNCTIONS.get(energy or self._energy_name)
+        if band is None or energy_fn is None or energy_fn.radius is None \
+                or self._energy is not None and energy in (None, self._energy_name):
+            return rotate(self.energy_map(energy))[:, lo:hi], None
+        # Only the energy of the pixels in the band is needed, and it only
+        # depends on the pixels within the energy function's radius of it
+        radius = energy_fn.radius
+        window = np.arange(lo - radius, hi + radius) % length
+        if vertical:
+            band_energy = energy_fn(self.pixels()[:, window])[:, radius:radius + hi - lo]
+        else:
+            band_energy = rotate(energy_fn(self.pixels()[window])[radius:radius + hi - lo])
+        if self._mask is not None:
+            band_energy += rotate(self._mask[:self._height, :self._width])[:, lo:hi]
+        return band_energy, None
+
+    def _find_seam(self, energy: np.ndarray, costs=None, processes=1, pyramid=False) -> list[int]:
+        '''
+        (Internal use only) Return the column index in each row of the
+        lowest-energy top-to-bottom seam through a 2-D energy array.
+        costs, if given, holds the extra cost of reaching each pixel from
+        its upper left, upper and upper right neighbors, as returned by
+        forward_costs.
+        '''
+        if pyramid:
+            if costs is not None or processes > 1:
+                raise ValueError("The pyramid search only works with backward energy on one process")
+            return self._pyramid_seam(energy)
+        energy_matrix, parents = self._cumulative_energy(energy, costs, processes)
+        return self._trace_seam(parents, int(energy_matrix[-1].argmin()))
+
+    def _cumulative_energy(self, energy: np.ndarray, costs=None, processes=1) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        (Internal use only) Return the cost of the cheapest seam from the
+        top row to every pixel, and the offset (-1, 0 or 1) of the column of
+        the parent each of those seams comes from
+        '''
+        if processes > 1:
+            if costs is not None:
+                raise ValueError("Forward energy can't be searched on several processes")
+            return self._tiled_finder(processes).cumulative_energy(energy)
+
+        height, width = energy.shape
+        self._costs = None
+        energy_matrix, parents, _, _ = self._scratch(height, width)
+        energy_matrix[0] = energy[0]
+        parents[0] = 0
+        if costs is not None:
+            energy_matrix[0] += costs[1][0]
+        self._cost_rows(energy, energy_matrix, parents, 1, costs)
+        return energy_matrix, parents
+
+    def _cost_rows(self, energy: np.ndarray, cost: np.ndarray, parents: np.ndarray, start: int, costs=None):
+        '''
+        (Internal use only) Fill in the cumulative costs and parent offsets
+        of every row from start down, whole rows at a time, from the costs
+        of the row above start
+        '''
+        width = energy.shape[1]
+        _, _, neighbors, best = self._scratch_buffers
+        neighbors, best, columns = neighbors[:, :width], best[:width], self._columns[:width]
+
+        # Create a matrix with the cumulative sum, one row at a time. Each
+        # row of neighbors holds the cost of the upper left, upper and upper
+        # right parents of every pixel, padded with infinity at the borders.
+        # Costs stay in float64, since float32 can't hold the sum of a tall
+        # column of energies exactly.
+        neighbors[0, 0] = neighbors[2, -1] = np.inf
+        for j in range(start, energy.shape[0]):
+            prev = cost[j-1, :width]
+            neighbors[0, 1:] = prev[:-1]
+            neighbors[1] = prev
+            neighbors[2, :-1] = prev[1:]
+            if costs is not None:
+                for k in range(3):
+                    neighbors[k] += costs[k][j]
+            neighbors.argmin(axis=0, out=best)
+            np.subtract(best, 1, out=parents[j, :width], casting='unsafe')
+            np.add(energy[j], neighbors[best, columns], out=cost[j, :width])
+
+    def _tiled_finder(self, processes: int) -> TiledSeamFinder:
+        '''
+        (Internal use only) Return a pool of the given number of worker
+        processes, started on first use and kept until close()
+        '''
+        capacity = max(self._pixels.shape[0] * self._pixels.shape[1], self._width * self._height)
+        if self._tiler is None or self._tiler.processes != processes or self._tiler.capacity < capacity:
+            self.close()
+            self._tiler = TiledSeamFinder(processes, capacity)
+        return self._tiler
+
+    def close(self):
+        '''
+        Stop the worker processes started for seam searches, if any. This
+        also happens when the carver is garbage collected, or at the end of
+        a with block.
+        '''
+        if self._tiler is not None:
+            self._tiler.close()
+            self._tiler = None
+
+    def _scratch(self, height: int, width: int) -> tuple[np.ndarray, ...]:
+        '''
+        (Internal use only) Return the cumulative cost, parent offset,
+        neighbor and argmin buffers for a height x width DP. They are
+        allocated once, big enough for the original picture in either
+        orientation, and reused by every later seam.
+        '''
+        size = height * width
+        if self._scratch_buffers is None or self._scratch_buffers[0].size < size \
+                or self._scratch_buffers[2].shape[1] < width:
+            capacity = max(size, self._pixels.shape[0] * self._pixels.shape[1])
+            length = max(width, *self._pixels.shape[:2])
+            self._scratch_buffers = (
+                np.empty(capacity), np.empty(capacity, dtype=np.int8),
+                np.empty((3, length)), np.empty(length, dtype=np.intp),
+            )
+            self._columns = np.arange(length)
+        cost, parents, neighbors, best = self._scratch_buffers
+        return (cost[:size].reshape(height, width), parents[:size].reshape(height, width),
+                neighbors[:, :width], best[:width])
+
+    def _trace_seam(self, parents: np.ndarray, end: int) -> list[int]:
+        '''
+        (Internal use only) Return the seam ending at column end of the last
+        row, by following the parent offsets back up to the top row
         '''
-        sc = SeamCarver(Picture.picture(self).transpose(Image.ROTATE_90))
-        return sc.find_vertical_seam()[::-1] 
+        seam = [end]
+        for offsets in parents[:0:-1]:
+            end += int(offsets[end])
+            seam.append(end)
+        return seam[::-1]
+
+    def _disjoint_seams(self, k: int, energy: np.ndarray, costs=None) -> list[list[int]]:
+        '''
+        (Internal use only) Return up to k top-to-bottom seams that don't
+        share any pixel, traced from the cheapest end columns of a single
+        cumulative-cost pass. Only one seam is tried per local minimum of
+        the last row, since seams ending in the same valley merge further
+        up. When a seam's parent is already taken by a cheaper seam, it
+        detours through the cheapest free neighbor, and it is dropped if
+        there is none; after k dropped seams, the search stops.
+        '''
+        energy_matrix, parents = self._cumulative_energy(energy, costs)
+        height, width = energy.shape
+        taken = [bytearray(width) for _ in range(height)]
+        seams = []
+        failures = 0
+        for end in self._seam_endpoints(energy_matrix, width):
+            seam = [end]
+            for j in range(height-1, 0, -1):
+                parent = end + int(parents[j, end])
+                above = taken[j-1]
+                if above[parent]:
+                    # Detour through the cheapest free pixel above, leftmost
+                    # first on ties like the DP
+                    row = energy_matrix[j-1]
+                    parent = -1
+                    for i in (end-1, end, end+1):
+                        if 0 <= i < width and not above[i] and (parent < 0 or row[i] < row[parent]):
+                            parent = i
+                    if parent < 0:
+                        break
+                end = parent
+                seam.append(end)
+            else:
+                seam.reverse()
+                for j, i in enumerate(seam):
+                    taken[j][i] = 1
+                seams.append(seam)
+                if len(seams) == k:
+                    break
+                continue
+            failures += 1
+            if failures == k:
+                break
+        return seams
+
+    def _pyramid_seam(self, energy: np.ndarray, radius=8, smallest=32) -> list[int]:
+        '''
+        (Internal use only) Find a top-to-bottom seam on an energy array
+        halved in both directions, as many times as needed to get it under
+        smallest columns, then at each finer level search again only within
+        radius columns of where the coarser seam went
+        '''
+        height, width = energy.shape
+        band = 2 * radius + 2
+        if width < 2 * smallest or height < 2:
+            return self._find_seam(energy)
+
+        # Each pixel of the coarser level sums up a 2x2 block of this one,
+        # added up from strided views, which is much faster than summing
+        # over axes of a reshaped array. Only odd sizes need padding.
+        if height % 2 or width % 2:
+            energy = np.pad(energy, ((0, height % 2), (0, width % 2)), mode='edge')
+        coarse = energy[0::2, 0::2] + energy[1::2, 0::2]
+        coarse += energy[0::2, 1::2]
+        coarse += energy[1::2, 1::2]
+        energy = energy[:height, :width]
+        seam = np.array(self._pyramid_seam(coarse, radius, smallest))
+        lo = np.clip(2 * seam[np.arange(height) // 2] - radius, 0, width - band)
+        return self._banded_seam(energy, lo, band)
+
+    def _banded_seam(self, energy: np.ndarray, lo: np.ndarray, band: int) -> list[int]:
+        '''
+        (Internal use only) Return the lowest-energy top-to-bottom seam that
+        stays within columns lo[j] to lo[j]+band-1 of every row j
+        '''
+        height = energy.shape[0]
+        rows = np.arange(height)[:, None]
+        energy = energy[rows, lo[:, None] + np.arange(band)]
+        # Parents are looked up in the previous row's band, padded with
+        # infinity on both sides by as much as the bands move between rows
+        shift = np.diff(lo)
+        pad = int(np.abs(shift).max(initial=0)) + 1
+        padded = np.full(band + 2 * pad, np.inf)
+        neighbors = np.empty((3, band))
+        energy_matrix = np.empty((height, band))
+        parents = np.zeros((height, band), dtype=np.int8)
+        energy_matrix[0] = energy[0]
+        for j in range(1, height):
+            padded[pad:pad + band] = energy_matrix[j-1]
+            start = pad + shift[j-1]
+            for d in range(3):
+                neighbors[d] = padded[start + d - 1:start + d - 1 + band]
+            best = neighbors.argmin(axis=0)
+            energy_matrix[j] = energy[j] + neighbors[best, np.arange(band)]
+            parents[j] = best - 1
+
+        end = int(energy_matrix[-1].argmin())
+        seam = [end]
+        for j in range(height-1, 0, -1):
+            end += int(parents[j, end]) + shift[j-1]
+            seam.append(end)
+        return (np.array(seam[::-1]) + lo).tolist()
+
+    def _seam_endpoints(self, energy_matrix: np.ndarray, k: int) -> list[int]:
+        '''
+        (Internal use only) Return the columns of up to k local minima of
+        the last row, cheapest first. On a run of equal costs, only the
+        leftmost column counts.
+        '''
+        last = energy_matrix[-1]
+        left = np.concatenate([[np.inf], last[:-1]])
+        right = np.concatenate([last[1:], [np.inf]])
+        minima = np.flatnonzero((last < left) & (last <= right))
+        return minima[np.argsort(last[minima], kind='stable')][:k].tolist()
 
     def remove_vertical_seam(self, seam: list[int]):
         '''
@@ -91,12 +642,24 @@ class SeamCarver(Picture):
             raise SeamError("Invalid seam")
         elif height != seam_len:
             raise SeamError("Attempted to remove seam with wrong length")
-        else: 
-            for j in range(height):
-                for i in range(seam[j], width-1):
-                    self[i, j] = self[i + 1, j]
-                del self[width-1, j]
+        elif not all(0 <= i < width for i in seam):
+            raise SeamError("Invalid seam")
+        else:
+            for layer in self._layers():
+                for j in range(height):
+                    layer[j, seam[j]:width-1] = layer[j, seam[j]+1:width]
             self._width -= 1
+            self._image = None
+            self._update_energy(seam)
+
+    def _layers(self) -> list[np.ndarray]:
+        '''
+        (Internal use only) Return the buffers that are carved along with
+        the picture: the pixels, and the mask if there is one
+        '''
+        if self._mask is None:
+            return [self._pixels]
+        return [self._pixels, self._mask]
 
     def remove_horizontal_seam(self, seam: list[int]):
         '''
@@ -112,16 +675,438 @@ class SeamCarver(Picture):
             raise SeamError("Invalid seam")
         elif width != seam_len:
             raise SeamError("Attempted to remove seam with wrong length")
-        else: 
-            sc = SeamCarver(self.picture().rotate(90, expand=True))
-            sc.remove_vertical_seam(seam[::-1])
-
-            self._width = sc.height()
-            self._height = sc.width()
-            self.clear()
-            for j in range(self._height):
-                for i in range(self._width):
-                    self[i, j] = sc[j, (sc._height-1) - i]
+        elif not all(0 <= j < height for j in seam):
+            raise SeamError("Invalid seam")
+        else:
+            for layer in self._layers():
+                for i in range(width):
+                    layer[seam[i]:height-1, i] = layer[seam[i]+1:height, i]
+            self._height -= 1
+            self._image = None
+            self._update_energy(seam, vertical=False)
+
+    def remove_vertical_seams(self, seams: list[list[int]]):
+        '''
+        Remove several vertical seams that don't share any pixel, all given
+        in the coordinates of the current picture
+        '''
+        self._remove_seams(seams, vertical=True)
+
+    def remove_horizontal_seams(self, seams: list[list[int]]):
+        '''
+        Remove several horizontal seams that don't share any pixel, all given
+        in the coordinates of the current picture
+        '''
+        self._remove_seams(seams, vertical=False)
+
+    def _remove_seams(self, seams: list[list[int]], vertical: bool):
+        '''
+        (Internal use only) Remove disjoint seams in one pass, by packing the
+        pixels that are kept in every row (or column) to the front
+        '''
+        length, size = (self._height, self._width) if vertical else (self._width, self._height)
+        k = len(seams)
+        if k == 0:
+            return
+        elif k >= size:
+            raise SeamError(f"Can't shrink the image {'horizontally' if vertical else 'vertically'}")
+        for seam in seams:
+            if self.check_invalid_seam(seam) == False:
+                raise SeamError("Invalid seam")
+            elif len(seam) != length:
+                raise SeamError("Attempted to remove seam with wrong length")
+            elif not all(0 <= x < size for x in seam):
+                raise SeamError("Invalid seam")
+
+        keep = np.ones((length, size), dtype=bool)
+        keep[np.arange(length), np.array(seams)] = False
+        if keep.sum() != length * (size - k):
+            raise SeamError("Seams overlap")
+
+        # The energy map is packed along with the pixels and patched up
+        # around the seams, unless every pixel's energy may have changed
+        layers = self._layers()
+        patch = self._energy is not None and ENERGY_FUNCTIONS[self._energy_name].radius is not None
+        if patch:
+            layers.append(self._energy)
+        # Horizontal seams are removed as vertical seams of the transpose
+        for layer in layers:
+            layer = layer[:self._height, :self._width]
+            if not vertical:
+                layer = layer.swapaxes(0, 1)
+            layer[:, :size - k] = layer[keep].reshape(length, size - k, *layer.shape[2:])
+        if vertical:
+            self._width -= k
+        else:
+            self._height -= k
+        self._image = None
+        self._costs = None
+        if patch:
+            # The pixels of a line left of the m-th removed one move m to
+            # the left, so that is where its gap ends up
+            gaps = np.sort(np.array(seams).T, axis=1) - np.arange(k)
+            self._repair_energy(gaps.T.tolist(), vertical)
+        else:
+            self._refresh_energy()
+
+    def insert_vertical_seams(self, n: int):
+        '''
+        Widen the picture by n pixels, by duplicating its n lowest-energy
+        vertical seams
+        '''
+        self._insert_seams(n, vertical=True)
+
+    def insert_horizontal_seams(self, n: int):
+        '''
+        Make the picture n pixels taller, by duplicating its n lowest-energy
+        horizontal seams
+        '''
+        self._insert_seams(n, vertical=False)
+
+    def _insert_seams(self, n: int, vertical: bool):
+        '''
+        (Internal use only) Duplicate the n seams that carving would remove
+        first. They are all chosen on the picture as it is, by carving them
+        out of a copy, so none of them goes through a pixel inserted for
+        another. A picture only has one column (row) less than its width
+        (height) of seams to give, so bigger enlargements take more rounds.
+        '''
+        if n < 0:
+            raise SeamError("Can't insert a negative number of seams")
+        while n:
+            size, length = (self._width, self._height) if vertical else (self._height, self._width)
+            if size == 1:
+                # The only seam of a one-column picture is that column
+                self._duplicate_seams([[0] * length], vertical)
+                n -= 1
+                continue
+            k = min(n, size - 1)
+            self._duplicate_seams(self._removal_order(k, vertical).tolist(), vertical)
+            n -= k
+
+    def _duplicate_seams(self, seams: list[list[int]], vertical: bool):
+        '''
+        (Internal use only) Insert a new pixel after every pixel of some
+        disjoint seams, colored with the average of that pixel and the next
+        '''
+        # Horizontal seams are inserted as vertical seams of the transpose
+        pixels = self.pixels() if vertical else self.pixels().swapaxes(0, 1)
+        length, size = pixels.shape[:2]
+        rows = np.arange(length)[:, None]
+        columns = np.broadcast_to(np.arange(size), (length, size))
+        source = np.sort(np.concatenate([columns, np.array(seams).T], axis=1), axis=1)
+        carved = pixels[rows, source]
+        copies = np.zeros(source.shape, dtype=bool)
+        copies[:, 1:] = source[:, 1:] == source[:, :-1]
+        average = (carved.astype(np.uint16) + pixels[rows, np.minimum(source + 1, size - 1)]) // 2
+        carved[copies] = average[copies]
+        layers = [carved]
+        if self._mask is not None:
+            # Inserted pixels keep the marks of the pixels they copy
+            mask = self._mask[:self._height, :self._width]
+            layers.append((mask if vertical else mask.T)[rows, source])
+        if not vertical:
+            layers = [layer.swapaxes(0, 1) for layer in layers]
+
+        height, width = layers[0].shape[:2]
+        if height > self._pixels.shape[0] or width > self._pixels.shape[1]:
+            shape = (max(height, self._pixels.shape[0]), max(width, self._pixels.shape[1]))
+            self._pixels = np.empty(shape + (3,), dtype=np.uint8)
+            if self._mask is not None:
+                self._mask = np.empty(shape)
+            self._energy = None
+        for buffer, layer in zip(self._layers(), layers):
+            buffer[:height, :width] = layer
+        self._width, self._height = width, height
+        self._image = None
+        self._refresh_energy()
+
+    def carve(self, n_vertical: int, n_horizontal=0, order='vertical', batch=1) -> Picture:
+        '''
+        Remove n_vertical vertical seams and n_horizontal horizontal seams,
+        and return the resulting picture. The order can be 'vertical' (all
+        vertical seams first), 'optimal' (the order that removes the least
+        total energy, found with the transport map DP of the seam carving
+        paper) or 'greedy' (the cheaper of the two seams at every step).
+        The 'optimal' order carves about 2*(n_vertical+1)*(n_horizontal+1)
+        seams to find the best order, on n_horizontal+1 copies of the
+        picture at a time, so it is only practical for small counts.
+        With the 'vertical' order, a batch greater than 1 removes up to that
+        many disjoint seams per pass over the picture (see
+        find_vertical_seams for how many that turns out to be), which is
+        faster for big reductions but may pick slightly costlier seams.
+        '''
+        if n_vertical < 0 or n_horizontal < 0:
+            raise SeamError("Can't remove a negative number of seams")
+        elif n_vertical >= self._width:
+            raise SeamError("Can't shrink the image horizontally")
+        elif n_horizontal >= self._height:
+            raise SeamError("Can't shrink the image vertically")
+
+        if order == 'vertical' and batch > 1:
+            while n_vertical:
+                seams = self.find_vertical_seams(min(batch, n_vertical))
+                self.remove_vertical_seams(seams)
+                n_vertical -= len(seams)
+            while n_horizontal:
+                seams = self.find_horizontal_seams(min(batch, n_horizontal))
+                self.remove_horizontal_seams(seams)
+                n_horizontal -= len(seams)
+            steps = []
+        elif order == 'vertical':
+            steps = [True] * n_vertical + [False] * n_horizontal
+        elif order == 'optimal':
+            self._adopt(self._optimal_carve(n_vertical, n_horizontal))
+            steps = []
+        elif order == 'greedy':
+            while n_vertical and n_horizontal:
+                seam_v, seam_h = self.find_vertical_seam(), self.find_horizontal_seam()
+                if self._seam_energy(seam_v) <= self._seam_energy(seam_h, vertical=False):
+                    self.remove_vertical_seam(seam_v)
+                    n_vertical -= 1
+                else:
+                    self.remove_horizontal_seam(seam_h)
+                    n_horizontal -= 1
+            steps = [True] * n_vertical + [False] * n_horizontal
+        else:
+            raise ValueError(f"Unknown seam order {order!r}")
+
+        for vertical in steps:
+            self._carve_step(vertical)
+        return self
+
+    def carve_to(self, width: int, height: int, order='vertical', batch=1) -> Picture:
+        '''
+        Remove seams until the picture is width x height, and return the
+        resulting picture. See carve for the options.
+        '''
+        if width > self._width or height > self._height:
+            raise SeamError("Can't enlarge the image by removing seams")
+        return self.carve(self._width - width, self._height - height, order, batch)
+
+    def build_retarget_index(self, vertical=True, minimum=1, batch=1) -> np.ndarray:
+        '''
+        Carve a copy of the picture down to minimum columns (rows if not
+        vertical), and return the step at which each pixel was removed as
+        a 2-D array indexed by row then column. Pixels left over are
+        numbered after the last step, left to right (top to bottom), so
+        every row (column) holds each step once. Picture.retarget then
+        resizes the picture to any width (height) without finding seams.
+        See carve for batch.
+        '''
+        length = self._width if vertical else self._height
+        if not 1 <= minimum <= length:
+            raise SeamError(f"Can't shrink the image to {minimum} seams")
+        removed = self._removal_order(length - minimum, vertical, batch)
+        lines = np.arange(self._height if vertical else self._width)
+        index = np.empty((len(lines), length), dtype=np.min_scalar_type(length))
+        index[lines, removed] = np.arange(len(removed))[:, None]
+        left = np.ones(index.shape, dtype=bool)
+        left[lines, removed] = False
+        index[left] = np.tile(np.arange(len(removed), length), len(lines))
+        return index if vertical else index.T
+
+    def _removal_order(self, k: int, vertical: bool, batch=1) -> np.ndarray:
+        '''
+        (Internal use only) Carve k seams out of a copy of the picture, and
+        return where each of them was in this picture: row m holds the
+        column in every row (the row in every column) of the m-th seam
+        removed. See carve for batch.
+        '''
+        carver = self.copy()
+        lines, size = (self._height, self._width) if vertical else (self._width, self._height)
+        # The column (row) in this picture of every pixel left in the copy
+        origin = np.tile(np.arange(size), (lines, 1))
+        removed = np.empty((k, lines), dtype=np.intp)
+        rows = np.arange(lines)[:, None]
+        step = 0
+        while step < k:
+            n = min(batch, k - step)
+            if vertical:
+                seams = carver.find_vertical_seams(n) if n > 1 else [carver.find_vertical_seam()]
+            else:
+                seams = carver.find_horizontal_seams(n) if n > 1 else [carver.find_horizontal_seam()]
+            columns = np.array(seams).T
+            removed[step:step + len(seams)] = origin[rows, columns].T
+            keep = np.ones(origin.shape, dtype=bool)
+            keep[rows, columns] = False
+            origin = origin[keep].reshape(lines, -1)
+            if len(seams) > 1:
+                carver._remove_seams(seams, vertical)
+            elif vertical:
+                carver.remove_vertical_seam(seams[0])
+            else:
+                carver.remove_horizontal_seam(seams[0])
+            step += len(seams)
+        return removed
+
+    def copy(self) -> 'SeamCarver':
+        '''
+        Return a copy of the current picture, along with its energy map
+        '''
+        other = Picture.copy(self)
+        other._scratch_buffers = None
+        other._tiler = None
+        other._costs = None
+        if self._energy is not None:
+            other._energy = self.energy_map().copy()
+        if self._mask is not None:
+            other._mask = self._mask[:self._height, :self._width].copy()
+        return other
+
+    def _seam_energy(self, seam: list[int], vertical=True) -> float:
+        '''
+        (Internal use only) Return the total energy of the pixels on a seam
+        '''
+        energy = self.energy_map()
+        if vertical:
+            return float(energy[np.arange(len(seam)), seam].sum())
+        return float(energy[seam, np.arange(len(seam))].sum())
+
+    def _carve_step(self, vertical: bool) -> float:
+        '''
+        (Internal use only) Find and remove one seam, and return its energy
+        '''
+        if vertical:
+            seam = self.find_vertical_seam()
+            cost = self._seam_energy(seam)
+            self.remove_vertical_seam(seam)
+        else:
+            seam = self.find_horizontal_seam()
+            cost = self._seam_energy(seam, vertical=False)
+            self.remove_horizontal_seam(seam)
+        return cost
+
+    def _optimal_carve(self, n_vertical: int, n_horizontal: int) -> 'SeamCarver':
+        '''
+        (Internal use only) Return a copy of the picture carved in the order
+        of removals that removes the least total energy. Cell (r, c) of the
+        transport map holds the cheapest way to remove r vertical and c
+        horizontal seams. Filling it in carves about 2*(n_vertical+1)*
+        (n_horizontal+1) seams, and keeps n_horizontal+1 carved pictures at
+        a time, each with its pixels and energy map (11 bytes per pixel).
+        They share this picture's DP buffers and don't keep their DPs.
+        '''
+        self._scratch(1, 1)
+        self._costs = None
+
+        def step(sc, vertical):
+            # Carve a cell's picture without keeping its DP, which would
+            # only be patched and thrown away
+            sc._scratch_buffers, sc._columns = self._scratch_buffers, self._columns
+            seam = sc._find_seam(*sc._dp_inputs(vertical, False, None))
+            cost = sc._seam_energy(seam if vertical else seam[::-1], vertical)
+            if vertical:
+                sc.remove_vertical_seam(seam)
+            else:
+                sc.remove_horizontal_seam(seam[::-1])
+            sc._scratch_buffers = None
+            return cost
+
+        cost = np.zeros((n_vertical + 1, n_horizontal + 1))
+        row = [self.copy()]
+        for c in range(1, n_horizontal + 1):
+            sc = row[-1].copy()
+            cost[0, c] = cost[0, c-1] + step(sc, False)
+            row.append(sc)
+
+        for r in range(1, n_vertical + 1):
+            for c in range(n_horizontal + 1):
+                # Each picture of the previous row only feeds the cell below
+                # it, so it can be carved without copying, and replaced by
+                # the picture of the new cell
+                sc = row[c]
+                cost[r, c] = cost[r-1, c] + step(sc, True)
+                if c > 0:
+                    left = row[c-1].copy()
+                    left_cost = cost[r, c-1] + step(left, False)
+                    if left_cost < cost[r, c]:
+                        sc, cost[r, c] = left, left_cost
+                row[c] = sc
+        return row[-1]
+
+    def _adopt(self, other: 'SeamCarver'):
+        '''
+        (Internal use only) Take over the pixels, mask and energy map of a
+        carved copy of the picture
+        '''
+        self._pixels, self._mask = other._pixels, other._mask
+        self._width, self._height = other._width, other._height
+        self._energy = other._energy
+        self._costs = None
+        self._image = None
+
+    def _update_energy(self, seam: list[int], vertical=True):
+        '''
+        (Internal use only) Shift the stored energy map over a removed
+        seam, then recompute only the pixels next to it
+        '''
+        energy_fn = ENERGY_FUNCTIONS[self._energy_name]
+        if energy_fn.radius is None:
+            self._energy = None
+        if self._energy is None:
+            self._costs = None
+            return
+        # Horizontal seams are handled as vertical seams of the transpose
+        if vertical:
+            energy = self._energy[:self._height]
+            length = self._width
+        else:
+            energy = self._energy[:, :self._width].T
+            length = self._height
+        for k, s in enumerate(seam):
+            energy[k, s:length] = energy[k, s+1:length+1]
+
+        repaired = self._repair_energy([seam], vertical)
+        if repaired is not None and self._costs is not None and self._costs[0] == vertical:
+            rows, cols, old = repaired
+            changed = self._energy[rows, cols] != old
+            self._patch_costs(seam, vertical, rows[changed], cols[changed])
+        else:
+            self._costs = None
+
+    def _repair_energy(self, seams: list[list[int]], vertical: bool) -> tuple | None:
+        '''
+        (Internal use only) Recompute the stored energy of the pixels that
+        had a pixel of a removed seam within the energy function's radius,
+        given where each seam left a gap in the current picture. Return
+        their rows, columns and former energy, or None if the whole map was
+        recomputed instead.
+        '''
+        energy_fn = ENERGY_FUNCTIONS[self._energy_name]
+        radius = energy_fn.radius
+        length = self._width if vertical else self._height
+        lines = len(seams[0])
+        affected = [_affected_pixels(seam, length, lines, radius) for seam in seams]
+        rows = np.concatenate([rows for rows, _ in affected])
+        cols = np.concatenate([cols for _, cols in affected])
+        lo, hi = min(map(min, seams)) - radius, max(map(max, seams)) + radius
+        # Recomputing every affected pixel on its own window costs (2r+1)^2
+        # pixels each, which is a lot for wide windows. Recomputing the strip
+        # of columns (rows) that the seams run through costs its width plus
+        # 2r in every row, and covers the wraparound at the borders too.
+        if (hi - lo + 2 * radius) * lines < len(rows) * (2 * radius + 1) ** 2:
+            if hi - lo >= length:
+                self._refresh_energy()
+                return None
+            strip = np.arange(lo, hi) % length
+            window = np.arange(lo - radius, hi + radius) % length
+            if vertical:
+                values = energy_fn(self.pixels()[:, window])[:, radius:radius + hi - lo]
+                rows, cols = np.repeat(np.arange(self._height), hi - lo), np.tile(strip, self._height)
+            else:
+                values = energy_fn(self.pixels()[window])[radius:radius + hi - lo]
+                rows, cols = np.repeat(strip, self._width), np.tile(np.arange(self._width), hi - lo)
+            values = values.ravel()
+        else:
+            if not vertical:
+                rows, cols = cols, rows
+            values = _energy_at(self.pixels(), rows, cols, energy_fn)
+        if self._mask is not None:
+            values += self._mask[rows, cols]
+        old = self._energy[rows, cols]
+        self._energy[rows, cols] = values
+        return rows, cols, old
 
     def check_invalid_seam(self, seam: list[int]):
         for i in range(len(seam)-1):
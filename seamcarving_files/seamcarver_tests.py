@@ -2,7 +2,12 @@
 
 from seamcarver import *
 from grading_utils import BruhTestRunner, score
+from energy import ENERGY_FUNCTIONS
+from multisize import MultisizeFile, save_multisize
 from PIL import Image
+import numpy as np
+import os
+import tempfile
 import unittest
 
 class SeamCarverTester(unittest.TestCase):
@@ -168,6 +173,330 @@ class SeamCarverTester(unittest.TestCase):
         with self.assertRaises(SeamError):
             ex1.remove_horizontal_seam(seam)
 
+    @score(2)
+    def sctest_016_pixels_view_ex3(self):
+        'Pixel buffer view matches the picture after removing a vertical seam'
+        ex3 = SeamCarver(Image.open('data/6x5.png'))
+        ex3.remove_vertical_seam(ex3.find_vertical_seam())
+        self.assertEqual(ex3.pixels().shape, (5, 5, 3))
+        self.assertEqual(len(ex3), 25)
+        for i, j in ex3.keys():
+            self.assertEqual(tuple(ex3.pixels()[j, i]), ex3[i, j], f'pixel {i, j} does not match')
+        with self.assertRaises(ValueError):
+            ex3.pixels()[0, 0] = 0
+
+    @score(2)
+    def sctest_017_energy_map_ex3(self):
+        'Energy map agrees with the energy of every pixel from example 3'
+        ex3 = SeamCarver(Image.open('data/6x5.png'))
+        energy = ex3.energy_map()
+        self.assertEqual(energy.shape, (5, 6))
+        for i, j in ex3.keys():
+            self.assertAlmostEqual(energy[j, i], ex3.energy(i, j), msg=f'pixel {i, j} does not match')
+
+    @score(2)
+    def sctest_018_energy_map_after_removal(self):
+        'Energy map is kept up to date after removing vertical seams'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        sc.energy_map()
+        for _ in range(10):
+            sc.remove_vertical_seam(sc.find_vertical_seam())
+        fresh = SeamCarver(sc.picture())
+        self.assertTrue((sc.energy_map() == fresh.energy_map()).all())
+
+    @score(2)
+    def sctest_019_energy_map_after_horizontal_removal(self):
+        'Energy map is kept up to date after removing horizontal seams'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        sc.energy_map()
+        for _ in range(10):
+            sc.remove_horizontal_seam(sc.find_horizontal_seam())
+        fresh = SeamCarver(sc.picture())
+        self.assertTrue((sc.energy_map() == fresh.energy_map()).all())
+
+    @score(2)
+    def sctest_020_remove_seam_out_of_bounds(self):
+        'Throw SeamError if attempted to remove a seam that leaves the picture'
+        ex3 = SeamCarver(Image.open('data/6x5.png'))
+        with self.assertRaises(SeamError):
+            ex3.remove_vertical_seam([5, 5, 6, 5, 5])
+        with self.assertRaises(SeamError):
+            ex3.remove_horizontal_seam([0, 0, -1, 0, 0, 0])
+
+    @score(3)
+    def sctest_021_carve_to_ex3(self):
+        'Carve example 3 down to 4x3 in one call'
+        ex3 = SeamCarver(Image.open('data/6x5.png'))
+        expected = SeamCarver(Image.open('data/6x5.png'))
+        for _ in range(2):
+            expected.remove_vertical_seam(expected.find_vertical_seam())
+        for _ in range(2):
+            expected.remove_horizontal_seam(expected.find_horizontal_seam())
+        out = ex3.carve_to(4, 3)
+        self.assertEqual(out.width(), 4, 'width is not 4')
+        self.assertEqual(out.height(), 3, 'height is not 3')
+        for i, j in expected.keys():
+            self.assertEqual(out[i, j], expected[i, j], f'pixel {i, j} does not match')
+        with self.assertRaises(SeamError):
+            ex3.carve_to(5, 3)
+
+    @score(2)
+    def sctest_022_carve_to_orders(self):
+        'Carve to the same size with each seam order'
+        for order in ['vertical', 'optimal', 'greedy']:
+            sc = SeamCarver(Image.open('data/sunset_small.png'))
+            out = sc.carve_to(150, 55, order)
+            self.assertEqual((out.width(), out.height()), (150, 55), f'wrong size for {order} order')
+        with self.assertRaises(ValueError):
+            sc.carve_to(140, 50, 'sideways')
+
+    @score(2)
+    def sctest_023_forward_energy_seams(self):
+        'Find and remove forward-energy seams in both directions'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        seam = sc.find_vertical_seam(forward=True)
+        self.assertEqual(len(seam), sc.height())
+        sc.remove_vertical_seam(seam)
+        seam = sc.find_horizontal_seam(forward=True)
+        self.assertEqual(len(seam), sc.width())
+        sc.remove_horizontal_seam(seam)
+        self.assertEqual((sc.width(), sc.height()), (159, 62))
+
+    @score(2)
+    def sctest_024_energy_functions(self):
+        'Carve with every registered energy function'
+        for name, energy_fn in ENERGY_FUNCTIONS.items():
+            sc = SeamCarver(Image.open('data/sunset_small.png'), energy=name)
+            sc.carve(3, 3)
+            self.assertTrue((abs(sc.energy_map() - energy_fn(sc.pixels())) < 1e-6).all(), f'{name} map is stale')
+        sc = SeamCarver(Image.open('data/6x5.png'))
+        self.assertEqual(len(sc.find_vertical_seam(energy='sobel')), 5)
+        with self.assertRaises(ValueError):
+            sc.set_energy_function('brightness')
+
+    @score(3)
+    def sctest_025_disjoint_seams(self):
+        'Find and remove several disjoint vertical seams at once'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        seams = sc.find_vertical_seams(5)
+        self.assertEqual(len(seams), 5)
+        self.assertEqual(seams[0], sc.find_vertical_seam())
+        for j in range(sc.height()):
+            self.assertEqual(len({seam[j] for seam in seams}), 5, f'seams overlap in row {j}')
+        sc.remove_vertical_seams(seams)
+        self.assertEqual((sc.width(), sc.height()), (155, 63))
+        with self.assertRaises(SeamError):
+            sc.remove_vertical_seams([seams[0], seams[0]])
+
+    @score(2)
+    def sctest_026_find_seam_processes(self):
+        'Find the same seams on several processes as on one'
+        with SeamCarver(Image.open('data/sunset_small.png')) as sc:
+            self.assertEqual(sc.find_vertical_seam(processes=2), sc.find_vertical_seam())
+            self.assertEqual(sc.find_horizontal_seam(processes=2), sc.find_horizontal_seam())
+        self.assertIsNone(sc._tiler, 'workers were not stopped')
+
+    @score(3)
+    def sctest_027_insert_vertical_seam_ex3(self):
+        'Insert a vertical seam into example 3'
+        ex3 = SeamCarver(Image.open('data/6x5.png'))
+        original = ex3.copy()
+        seam = ex3.find_vertical_seam()
+        ex3.insert_vertical_seams(1)
+        self.assertEqual(ex3.width(), 7, 'width is not 7')
+        self.assertEqual(ex3.height(), 5, 'height is not 5')
+        for j, s in enumerate(seam):
+            for i in range(s + 1):
+                self.assertEqual(ex3[i, j], original[i, j], f'pixel {i, j} does not match')
+            for i in range(s + 1, 6):
+                self.assertEqual(ex3[i + 1, j], original[i, j], f'pixel {i + 1, j} does not match')
+            right = original[min(s + 1, 5), j]
+            average = tuple((a + b) // 2 for a, b in zip(original[s, j], right))
+            self.assertEqual(ex3[s + 1, j], average, f'pixel {s + 1, j} is not the average')
+
+    @score(2)
+    def sctest_028_insert_seams(self):
+        'Enlarge a picture by a fifth in both directions'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        original = sc.pixels().copy()
+        # The seams doubled are the first ones carving would remove, all
+        # picked on the original picture
+        doubled = sc.build_retarget_index(minimum=128) < 32
+        sc.insert_vertical_seams(32)
+        columns = np.arange(160) + np.cumsum(doubled, axis=1) - doubled
+        self.assertTrue((sc.pixels()[np.arange(63)[:, None], columns] == original).all(), 'wrong seams doubled')
+        sc.insert_horizontal_seams(13)
+        self.assertEqual((sc.width(), sc.height()), (192, 76))
+        self.assertTrue((sc.energy_map() == SeamCarver(sc.picture()).energy_map()).all())
+
+    @score(3)
+    def sctest_029_protect_and_remove_masks(self):
+        'Carve around protected pixels and carve away pixels marked for removal'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        kept = sc.pixels()[:, 40:80].copy()
+        protect = np.zeros((63, 160), dtype=bool)
+        protect[:, 40:80] = True
+        remove = np.zeros((63, 160), dtype=bool)
+        remove[20:30, 100:110] = True
+        sc.set_mask(protect, remove)
+        sc.remove_object()
+        self.assertEqual(sc.width(), 150, 'width is not 150')
+        sc.carve(20)
+        self.assertEqual(sc.width(), 130, 'width is not 130')
+        left = [i for i in range(sc.width()) if (sc.pixels()[:, i] == kept[:, 0]).all()][0]
+        self.assertTrue((sc.pixels()[:, left:left + 40] == kept).all(), 'protected pixels were carved')
+
+    @score(2)
+    def sctest_030_pyramid_seam(self):
+        'Find a valid seam, and a flat strip through noise, with the pyramid search'
+        noise = np.random.default_rng(30).integers(0, 256, (120, 200, 3), dtype=np.uint8)
+        noise[:, 150:156] = 128
+        sc = SeamCarver(Image.fromarray(noise))
+        seam = sc.find_vertical_seam(pyramid=True)
+        self.assertEqual(seam, sc.find_vertical_seam(), 'pyramid seam missed the flat strip')
+        sc = SeamCarver(Image.open('data/HJoceanSmall.jpg'))
+        seam = sc.find_horizontal_seam(pyramid=True)
+        self.assertEqual(len(seam), sc.width())
+        self.assertTrue(sc.check_invalid_seam(seam), 'pyramid seam is invalid')
+        self.assertTrue(0 <= min(seam) and max(seam) < sc.height(), 'pyramid seam is out of bounds')
+
+    @score(2)
+    def sctest_031_banded_seam(self):
+        'Find seams restricted to a band of columns or rows'
+        sc = SeamCarver(Image.open('data/HJoceanSmall.jpg'))
+        seam = sc.find_vertical_seam(band=(100, 150))
+        self.assertTrue(all(100 <= i < 150 for i in seam), 'seam leaves the band')
+        self.assertTrue(sc.check_invalid_seam(seam), 'banded seam is invalid')
+        energy = sc.energy_map()[:, 100:150]
+        self.assertEqual(seam, [i + 100 for i in sc._find_seam(energy)])
+        fresh = SeamCarver(Image.open('data/HJoceanSmall.jpg'))
+        self.assertEqual(fresh.find_horizontal_seam(band=(20, 60)), sc.find_horizontal_seam(band=(20, 60)))
+        with self.assertRaises(ValueError):
+            sc.find_vertical_seam(band=(150, 100))
+
+    @score(2)
+    def sctest_032_picture_constructors(self):
+        'Build pictures from PIL images in other modes, arrays and raw bytes'
+        img = Image.open('data/sunset_small.png').convert('RGB')
+        expected = np.array(img)
+        for mode in ('RGBA', 'L', 'P'):
+            converted = np.array(img.convert(mode).convert('RGB'))
+            self.assertTrue((SeamCarver.from_pil(img.convert(mode)).pixels() == converted).all(), mode)
+        pixels = expected.copy()
+        sc = SeamCarver.from_array(pixels, energy='sobel')
+        self.assertTrue(sc._pixels is pixels, 'array was copied')
+        data = bytearray(img.tobytes())
+        sc = SeamCarver.from_bytes(data, img.size)
+        self.assertTrue(np.shares_memory(sc._pixels, np.frombuffer(data, dtype=np.uint8)), 'bytes were copied')
+        self.assertTrue((sc.pixels() == expected).all())
+        sc.carve(10)
+        self.assertEqual((sc.width(), sc.height()), (150, 63))
+
+    @score(2)
+    def sctest_033_cached_picture(self):
+        'Export the same image until the picture changes, then a new one'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        img = sc.picture()
+        self.assertTrue(sc.picture() is img, 'unchanged picture was exported again')
+        self.assertTrue((np.array(img) == sc.pixels()).all())
+        for change in (lambda: sc.remove_vertical_seam(sc.find_vertical_seam()),
+                       lambda: sc.remove_horizontal_seam(sc.find_horizontal_seam()),
+                       lambda: sc.carve(4, 2, batch=2),
+                       lambda: sc.insert_vertical_seams(3),
+                       lambda: sc.color_seam(sc.find_vertical_seam())):
+            change()
+            new = sc.picture()
+            self.assertFalse(new is img, 'stale picture after a change')
+            self.assertEqual(new.size, (sc.width(), sc.height()))
+            self.assertTrue((np.array(new) == sc.pixels()).all())
+            img = new
+
+    @score(1)
+    def sctest_034_qimage_view(self):
+        'Wrap the pixel buffer of a carved picture in a QImage without copying'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        sc.carve(10, 5)
+        qim = sc._to_qimage()
+        self.assertEqual((qim.width(), qim.height()), (150, 58))
+        self.assertEqual(qim.bytesPerLine(), sc._pixels.strides[0])
+        for i, j in ((0, 0), (149, 57), (100, 40)):
+            self.assertEqual(qim.pixelColor(i, j).getRgb()[:3], sc[i, j])
+        sc[100, 40] = (1, 2, 3)
+        self.assertEqual(qim.pixelColor(100, 40).getRgb()[:3], (1, 2, 3), 'buffer was copied')
+
+    @score(3)
+    def sctest_035_retarget_index(self):
+        'Resize to any width or height from a removal index without finding seams'
+        img = Image.open('data/sunset_small.png')
+        sc = SeamCarver(img)
+        for vertical, size in ((True, 150), (True, 40), (False, 50)):
+            index = sc.build_retarget_index(vertical)
+            self.assertEqual(index.shape, (63, 160))
+            expected = SeamCarver(img)
+            for _ in range((160 if vertical else 63) - size):
+                expected._carve_step(vertical)
+            self.assertTrue((sc.retarget(index, size, vertical).pixels() == expected.pixels()).all())
+        index = sc.build_retarget_index(minimum=100, batch=10)
+        self.assertTrue((np.sort(index, axis=1) == np.arange(160)).all(), 'steps are not a permutation')
+        self.assertEqual(sc.retarget(index, 120).width(), 120)
+
+    @score(2)
+    def sctest_036_multisize_file(self):
+        'Save a picture with its removal indices and resize it from the file'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sunset_small.msz')
+            save_multisize(path, sc, batch=8)
+            stored = MultisizeFile(path)
+            self.assertEqual((stored.width(), stored.height()), (160, 63))
+            for vertical, size in ((True, 120), (False, 40)):
+                expected = sc.retarget(sc.build_retarget_index(vertical, batch=8), size, vertical)
+                self.assertTrue((stored.retarget(size, vertical).pixels() == expected.pixels()).all())
+            del stored
+
+    @score(2)
+    def sctest_037_kept_cumulative_costs(self):
+        'Patched cumulative costs match a full DP after removing seams'
+        for path in ('data/HJoceanSmall.jpg', 'data/sunset_small.png'):
+            sc = SeamCarver(Image.open(path))
+            for vertical in (True, True, False, True, False, False):
+                seam = sc.find_vertical_seam() if vertical else sc.find_horizontal_seam()
+                energy, _ = sc._dp_inputs(vertical, False, None)
+                self.assertEqual(seam if vertical else seam[::-1], sc.copy()._find_seam(energy))
+                if vertical:
+                    sc.remove_vertical_seam(seam)
+                else:
+                    sc.remove_horizontal_seam(seam)
+                kept, cost, parents = sc._costs
+                self.assertEqual(kept, vertical)
+                self.assertTrue(np.shares_memory(cost, sc._scratch_buffers[0]), 'costs reallocated')
+                energy, _ = sc._dp_inputs(vertical, False, None)
+                height, width = energy.shape
+                expected_cost, expected_parents = sc.copy()._cumulative_energy(energy)
+                self.assertTrue((cost[:height, :width] == expected_cost).all(), 'costs differ')
+                self.assertTrue((parents[:height, :width] == expected_parents).all(), 'parents differ')
+
+    @score(2)
+    def sctest_038_insert_into_one_pixel(self):
+        'Insert seams into a picture one pixel wide or tall'
+        column = np.arange(15, dtype=np.uint8).reshape(5, 1, 3)
+        sc = SeamCarver(column)
+        sc.insert_vertical_seams(3)
+        self.assertEqual((sc.width(), sc.height()), (4, 5))
+        self.assertTrue((sc.pixels() == column).all(), 'columns are not copies')
+        sc = SeamCarver(column.swapaxes(0, 1))
+        sc.insert_horizontal_seams(2)
+        self.assertEqual((sc.width(), sc.height()), (5, 3))
+        self.assertTrue((sc.pixels() == column.swapaxes(0, 1)).all(), 'rows are not copies')
+
+    @score(1)
+    def sctest_039_no_disjoint_seams(self):
+        'Find no disjoint seams when asked for none or fewer'
+        sc = SeamCarver(Image.open('data/sunset_small.png'))
+        for k in (0, -3):
+            self.assertEqual(sc.find_vertical_seams(k), [])
+            self.assertEqual(sc.find_horizontal_seams(k), [])
+
 if __name__ == '__main__':
     unittest.defaultTestLoader.testMethodPrefix = 'sctest'
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(SeamCarverTester)